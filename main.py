@@ -1,13 +1,29 @@
+from __future__ import annotations
+
+import asyncio
+import csv
+import datetime
 import streamlit as st
-import google.generativeai as genai
-from PIL import Image
+import hashlib
 import json
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, TYPE_CHECKING
 import io
-import pandas as pd
 import os
 
+if TYPE_CHECKING:
+    import google.generativeai as genai
+    import pandas as pd
+    from PIL import Image
+
+def _ensure_heavy_imports():
+    """Imports the heavyweight dependencies (pandas, the Gemini SDK, Pillow)
+    on first use so the script replay before an API key is set stays cheap."""
+    global genai, pd, Image
+    import google.generativeai as genai
+    import pandas as pd
+    from PIL import Image
+
 # --- Page Configuration ---
 st.set_page_config(
     page_title="Gemini KYC Data Extractor Pro",
@@ -16,7 +32,9 @@ st.set_page_config(
 )
 
 # --- Constants ---
-EXCEL_FILE_PATH = "kyc_database.xlsx"
+# Persistent store is a CSV append log; XLSX is materialized only on download
+DB_FILE_PATH = "kyc_database.csv"
+LEGACY_EXCEL_PATH = "kyc_database.xlsx"
 
 # --- Pydantic Schema for KYC Data Structure ---
 class KYCFormData(BaseModel):
@@ -50,56 +68,80 @@ class KYCFormData(BaseModel):
     confidence_score: Optional[float]
     model_used: Optional[str]
 
-# Define the column order for the Excel file
-EXCEL_COLUMNS = list(KYCFormData.model_fields.keys())
-
-# --- Excel Database Functions ---
-def create_excel_file():
-    """Creates the Excel file with proper headers if it doesn't exist"""
-    if not os.path.exists(EXCEL_FILE_PATH):
-        df = pd.DataFrame(columns=EXCEL_COLUMNS)
-        df.to_excel(EXCEL_FILE_PATH, index=False)
-        st.success(f"✅ Created new database file: {EXCEL_FILE_PATH}")
-        return df
-    return pd.read_excel(EXCEL_FILE_PATH)
-
-def load_excel_data():
-    """Loads existing Excel data or creates new file"""
-    return create_excel_file()
-
-def save_to_excel(data_dict):
-    """Saves the KYC data to Excel file"""
+# Define the column order for the database; frozen since the schema is fixed
+EXCEL_COLUMNS = tuple(KYCFormData.model_fields)
+
+# Fields an extraction must fill before the cheap model's answer is accepted
+REQUIRED_FIELDS = (
+    'name',
+    'date_of_birth',
+    'mobile_number',
+    'pan_number',
+    'aadhar_number',
+    'account_number',
+    'ifsc_code',
+)
+
+# Human-readable field labels, computed once since the schema is fixed
+DISPLAY_LABELS = {col: col.replace('_', ' ').title() for col in EXCEL_COLUMNS}
+
+# --- Database Functions ---
+def create_database_file():
+    """Creates the CSV database with proper headers if it doesn't exist"""
+    if not os.path.exists(DB_FILE_PATH):
+        if os.path.exists(LEGACY_EXCEL_PATH):
+            # One-time migration from the old XLSX store
+            migrated = pd.read_excel(LEGACY_EXCEL_PATH)
+            migrated.to_csv(DB_FILE_PATH, index=False)
+            st.success(f"✅ Migrated existing database to {DB_FILE_PATH}")
+            return migrated
+        else:
+            with open(DB_FILE_PATH, 'w', newline='') as f:
+                csv.DictWriter(f, fieldnames=EXCEL_COLUMNS).writeheader()
+            st.success(f"✅ Created new database file: {DB_FILE_PATH}")
+    return pd.DataFrame(columns=EXCEL_COLUMNS)
+
+@st.cache_data(ttl="10m", max_entries=4, show_spinner=False)
+def _read_db_cached(path: str, mtime: float):
+    """Reads the CSV once per on-disk version; mtime in the key means a
+    rerun hits the cache until the file actually changes."""
+    return pd.read_csv(path)
+
+def load_database():
+    """Loads existing database or creates new file"""
+    if not os.path.exists(DB_FILE_PATH):
+        return create_database_file()
+    return _read_db_cached(DB_FILE_PATH, os.path.getmtime(DB_FILE_PATH))
+
+def save_record(data_dict):
+    """Appends the KYC record to the CSV log; O(1) per save, no file rewrite"""
     try:
-        # Load existing data
-        df = load_excel_data()
-        
-        # Create new record DataFrame
-        new_record = pd.DataFrame([data_dict])
-        
-        # Ensure all columns are present in the correct order
-        for col in EXCEL_COLUMNS:
-            if col not in new_record.columns:
-                new_record[col] = None
-        
-        new_record = new_record[EXCEL_COLUMNS]
-        
-        # Append to existing data
-        df = pd.concat([df, new_record], ignore_index=True)
-        
-        # Save to Excel
-        df.to_excel(EXCEL_FILE_PATH, index=False)
-        
-        st.success(f"✅ Data successfully saved to {EXCEL_FILE_PATH}")
+        # Make sure the file and headers exist
+        if not os.path.exists(DB_FILE_PATH):
+            create_database_file()
+
+        with open(DB_FILE_PATH, 'a', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=EXCEL_COLUMNS, extrasaction='ignore')
+            writer.writerow(data_dict)
+
+        # Drop the cached read so the sidebar picks up the new record
+        _read_db_cached.clear()
+
+        st.success(f"✅ Data successfully saved to {DB_FILE_PATH}")
         return True
     except Exception as e:
-        st.error(f"❌ Error saving to Excel: {e}")
+        st.error(f"❌ Error saving record: {e}")
         return False
 
 def download_excel_file():
-    """Prepares Excel file for download"""
+    """Materializes the CSV database as an XLSX for download"""
     try:
-        df = load_excel_data()
+        df = load_database()
         buffer = io.BytesIO()
+        # Note: xlsxwriter's constant_memory mode cannot be used here -
+        # df.to_excel writes body cells column-major, and constant_memory
+        # silently drops writes to already-flushed rows, corrupting every
+        # export with more than one record.
         with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
             df.to_excel(writer, sheet_name='KYC_Data', index=False)
         return buffer.getvalue()
@@ -108,17 +150,46 @@ def download_excel_file():
         return None
 
 # --- Gemini API Extraction Logic ---
-def enhanced_gemini_extraction(image: Image.Image):
+@st.cache_resource
+def get_gemini_model(model_name: str):
+    """Returns a cached GenerativeModel instance so SDK setup isn't repeated on every rerun.
+
+    The returned object is shared across sessions - do not mutate it.
     """
-    Extracts data from a KYC form image using multiple Gemini models for best results.
+    return genai.GenerativeModel(model_name)
+
+@st.cache_resource(ttl="45m", show_spinner=False)
+def get_prompt_cache(model_name: str, prompt: str):
+    """Registers the stable extraction prompt with Gemini's server-side
+    context cache so only the image varies per request.
+
+    Returns None when the API refuses the cache (e.g. the prompt is below
+    the minimum cacheable token count), in which case callers fall back to
+    sending the prompt inline. The local handle's 45m TTL is deliberately
+    shorter than the CachedContent's 1h server TTL so we recreate the
+    cache before holding a handle to an expired one.
     """
-    models_to_try = [
-        'gemini-1.5-pro-latest',
-        'gemini-1.5-flash-latest',
-    ]
-    
-    # Comprehensive prompt for high-accuracy extraction
-    prompt = """
+    try:
+        return genai.caching.CachedContent.create(
+            model=model_name,
+            contents=[prompt],
+            ttl=datetime.timedelta(hours=1),
+        )
+    except Exception:
+        return None
+
+@st.cache_data(ttl="1h", show_spinner=False)
+def validate_api_key(api_key: str) -> bool:
+    """Validates the API key against the Gemini API. Cached so sidebar reruns don't re-hit the API."""
+    genai.configure(api_key=api_key)
+    # Fetching one known model's metadata proves auth without enumerating
+    # and materializing the full model list
+    _ = genai.get_model('models/gemini-1.5-flash-latest')
+    return True
+
+# Comprehensive prompt for high-accuracy extraction, shared by the
+# single-document ladder and the batched multi-document call
+_EXTRACTION_PROMPT = """
     You are an expert AI data extraction specialist for KYC (Know Your Customer) forms.
     Your task is to analyze the provided KYC form image and extract ALL visible information into a structured JSON format with extreme accuracy.
 
@@ -137,52 +208,153 @@ def enhanced_gemini_extraction(image: Image.Image):
     - Distinguish clearly between handwritten and printed text values and associate them with the correct fields.
     - Return the data strictly following the provided JSON schema.
     """
-    
-    best_result = None
-    highest_confidence = -1.0
-    errors = []
 
-    # Resize image for optimal performance
-    image.thumbnail([2048, 2048], Image.Resampling.LANCZOS)
-    
-    for model_name in models_to_try:
-        try:
-            st.write(f"⚙️ Trying model: `{model_name}`...")
-            model = genai.GenerativeModel(model_name)
-            
-            response = model.generate_content(
-                [prompt, image],
+# Batch variant, also rendered once per process
+_BATCH_EXTRACTION_PROMPT = _EXTRACTION_PROMPT + """
+    This request contains multiple KYC form images. Return a JSON array with
+    exactly one object per image, in the same order as the images.
+    """
+
+def _encode_image_payload(image: Image.Image):
+    """Encodes the resized image once as JPEG bytes. Passing a PIL image makes
+    the SDK re-serialize it losslessly (PNG) per call; a quality-85 JPEG of an
+    already-photographed form is much smaller and encodes once for all models."""
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buf = io.BytesIO()
+    image.save(buf, format='JPEG', quality=85, optimize=True)
+    return {"mime_type": "image/jpeg", "data": buf.getvalue()}
+
+def enhanced_gemini_extraction(image: Image.Image):
+    """
+    Extracts data from a KYC form image using multiple Gemini models for best results.
+    """
+    # Cheapest/fastest model first; escalate only when its answer isn't good enough
+    models_to_try = [
+        'gemini-1.5-flash-latest',
+        'gemini-1.5-pro-latest',
+    ]
+
+    image_payload = _encode_image_payload(image)
+
+    async def run_model_ladder():
+        """Walks the model ladder cheapest-first, escalating to the next
+        model only when the current result is low-confidence or leaves a
+        required field empty. Most documents never pay for the pro call."""
+        async def call_model(model_name):
+            prompt_cache = get_prompt_cache(model_name, _EXTRACTION_PROMPT)
+            if prompt_cache is not None:
+                # Prompt prefix is cached server-side; only the image is sent
+                model = genai.GenerativeModel.from_cached_content(prompt_cache)
+                contents = [image_payload]
+            else:
+                model = get_gemini_model(model_name)
+                contents = [_EXTRACTION_PROMPT, image_payload]
+            response = await model.generate_content_async(
+                contents,
                 generation_config=genai.GenerationConfig(
                     response_mime_type="application/json",
                     response_schema=KYCFormData
                 )
             )
-            
-            result_data = json.loads(response.text)
+            # pydantic-core parses the JSON and validates in one Rust pass,
+            # faster than json.loads plus ad-hoc dict handling
+            result_data = KYCFormData.model_validate_json(response.text).model_dump()
+            result_data['model_used'] = model_name
+            return result_data
+
+        best_result = None
+        highest_confidence = -1.0
+        errors = []
+
+        for model_name in models_to_try:
+            st.write(f"⚙️ Trying model: `{model_name}`...")
+            try:
+                result_data = await call_model(model_name)
+            except Exception as e:
+                errors.append(f"Model `{model_name}` failed: {e}")
+                continue
+
             confidence = result_data.get('confidence_score', 0.0) or 0.0
-            
+
             # If this result is better, store it
             if confidence > highest_confidence:
                 highest_confidence = confidence
                 best_result = result_data
-                best_result['model_used'] = model_name
 
-            # If we get a very confident result, we can stop early
-            if confidence > 0.98:
-                st.write("✅ High confidence result achieved. Finalizing...")
+            # A confident extraction with no required field missing means
+            # there is nothing for a stronger model to recover
+            missing = sum(1 for k in REQUIRED_FIELDS if not result_data.get(k))
+            if confidence > 0.9 and missing == 0:
+                st.write("✅ Complete high-confidence result. Skipping escalation.")
                 break
 
-        except Exception as e:
-            error_message = f"Model `{model_name}` failed: {e}"
-            errors.append(error_message)
-            st.warning(error_message)
-            continue
-            
-    if not best_result and errors:
+        return best_result, errors
+
+    best_result, errors = asyncio.run(run_model_ladder())
+
+    for error_message in errors:
+        st.warning(error_message)
+
+    if best_result:
+        st.write(f"✅ Best result from `{best_result.get('model_used')}`.")
+    elif errors:
         st.error("All models failed to process the image. Please check the API key, quotas, and image quality.")
 
     return best_result
 
+class ExtractionFailedError(Exception):
+    """Raised when every model fails, so the failure is never cached."""
+
+@st.cache_data(ttl="24h", max_entries=500, show_spinner=False)
+def cached_extraction(image_key: str, _image: Image.Image):
+    """Caches extraction results by image hash so re-uploading the same
+    document returns instantly instead of re-running the Gemini round-trip.
+
+    The underscore on _image tells Streamlit not to hash the PIL object;
+    the cache is keyed on image_key alone. All-models-failed runs raise
+    instead of returning None - st.cache_data does not cache exceptions,
+    so a transient quota or network failure isn't replayed for 24h.
+    """
+    result = enhanced_gemini_extraction(_image)
+    if result is None:
+        raise ExtractionFailedError("All models failed to process the image.")
+    return result
+
+def extract_with_cache(image: Image.Image):
+    """Resizes the image and dispatches to the hash-keyed extraction cache."""
+    # Resize image for optimal performance
+    image.thumbnail([2048, 2048], Image.Resampling.LANCZOS)
+    image_key = hashlib.blake2b(image.tobytes(), digest_size=16).hexdigest()
+    try:
+        return cached_extraction(image_key, image)
+    except ExtractionFailedError:
+        return None
+
+def batched_gemini_extraction(images: List[Image.Image]):
+    """
+    Extracts several KYC forms in a single Gemini call. The extraction prompt
+    is sent once and amortized across all images instead of once per document.
+    """
+    payloads = []
+    for image in images:
+        image.thumbnail([2048, 2048], Image.Resampling.LANCZOS)
+        payloads.append(_encode_image_payload(image))
+
+    model = get_gemini_model('gemini-1.5-flash-latest')
+    response = model.generate_content(
+        [_BATCH_EXTRACTION_PROMPT, *payloads],
+        generation_config=genai.GenerationConfig(
+            response_mime_type="application/json",
+            response_schema=list[KYCFormData]
+        )
+    )
+
+    results = [KYCFormData.model_validate(item).model_dump() for item in json.loads(response.text)]
+    for result in results:
+        result['model_used'] = 'gemini-1.5-flash-latest'
+    return results
+
 # --- Streamlit App UI ---
 st.title("📄 Gemini KYC Data Extractor Pro")
 st.markdown("Upload a KYC form image to automatically extract, review, edit, and save the information.")
@@ -194,6 +366,15 @@ if 'extracted_data' not in st.session_state:
     st.session_state.extracted_data = None
 if 'edited_data' not in st.session_state:
     st.session_state.edited_data = None
+if 'batch_results' not in st.session_state:
+    st.session_state.batch_results = None
+if 'batch_selected' not in st.session_state:
+    st.session_state.batch_selected = 0
+
+# Once a key has been validated every code path below needs the heavy
+# libraries, so load them up front on validated reruns
+if st.session_state.api_key_valid:
+    _ensure_heavy_imports()
 
 # --- Sidebar: API Key and Database Viewer ---
 with st.sidebar:
@@ -203,9 +384,8 @@ with st.sidebar:
     if st.button("Validate and Set API Key"):
         if api_key:
             try:
-                genai.configure(api_key=api_key)
-                # Test the key by listing models
-                models = [m for m in genai.list_models()]
+                _ensure_heavy_imports()
+                validate_api_key(api_key)
                 st.session_state.api_key_valid = True
                 st.success("API Key is valid!")
             except Exception as e:
@@ -217,59 +397,90 @@ with st.sidebar:
     st.markdown("---")
     
     # Database Management Section
-    st.header("📊 KYC Database")
-    
-    if st.session_state.api_key_valid:
-        # Initialize Excel file
-        df = load_excel_data()
-        
-        # Display database stats
-        st.metric("Total Records", len(df))
-        
-        # Refresh button
-        if st.button("🔄 Refresh Database"):
-            st.rerun()
-        
-        # Download database button
-        excel_data = download_excel_file()
-        if excel_data:
-            st.download_button(
-                label="📥 Download Database",
-                data=excel_data,
-                file_name="kyc_database.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
-        
-        # Display database in tabular format
-        with st.expander("📋 View Database Table", expanded=False):
-            if len(df) > 0:
-                st.dataframe(df, use_container_width=True, height=300)
-            else:
-                st.info("No records found. Extract some KYC data to populate the database.")
-    else:
-        st.info("Validate your API key to access database features.")
+    @st.fragment
+    def database_panel():
+        """Renders the sidebar database section. As a fragment, its buttons
+        rerun only this panel instead of the whole script."""
+        st.header("📊 KYC Database")
+
+        if st.session_state.api_key_valid:
+            # Initialize database file
+            df = load_database()
+
+            # Display database stats
+            st.metric("Total Records", len(df))
+
+            # Refresh button
+            if st.button("🔄 Refresh Database"):
+                st.rerun(scope="fragment")
+
+            # Download database button
+            excel_data = download_excel_file()
+            if excel_data:
+                st.download_button(
+                    label="📥 Download Database",
+                    data=excel_data,
+                    file_name="kyc_database.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                )
+
+            # Display database in tabular format
+            with st.expander("📋 View Database Table", expanded=False):
+                if len(df) > 0:
+                    st.dataframe(df, use_container_width=True, height=300)
+                else:
+                    st.info("No records found. Extract some KYC data to populate the database.")
+        else:
+            st.info("Validate your API key to access database features.")
+
+    database_panel()
 
 # --- Main App Body ---
 if st.session_state.api_key_valid:
-    st.header("1. Upload Your KYC Form")
-    uploaded_file = st.file_uploader("Choose an image file", type=["jpg", "jpeg", "png"])
-
-    if uploaded_file is not None:
+    st.header("1. Upload Your KYC Form(s)")
+    uploaded_files = st.file_uploader(
+        "Choose one or more image files", type=["jpg", "jpeg", "png"],
+        accept_multiple_files=True
+    )
+    uploaded_file = uploaded_files[0] if uploaded_files else None
+
+    if uploaded_files:
         col1, col2 = st.columns(2)
         with col1:
-            st.image(uploaded_file, caption="Uploaded KYC Form", use_column_width=True)
+            caption = "Uploaded KYC Form"
+            if len(uploaded_files) > 1:
+                caption = f"First of {len(uploaded_files)} uploaded KYC forms"
+            st.image(uploaded_file, caption=caption, use_column_width=True)
 
         with col2:
-            if st.button("🚀 Extract Data from Image", use_container_width=True):
-                with st.spinner("🤖 Gemini is analyzing the document... Please wait."):
+            if st.button("🚀 Extract Data from Image(s)", use_container_width=True):
+                with st.spinner("🤖 Gemini is analyzing the document(s)... Please wait."):
                     try:
-                        image = Image.open(uploaded_file)
+                        images = []
+                        for f in uploaded_files:
+                            image = Image.open(f)
+                            if image.format == 'JPEG':
+                                # Let the JPEG decoder stop at a reduced DCT scale;
+                                # avoids fully decoding large phone photos only to
+                                # throw the pixels away in the downscale.
+                                image.draft('RGB', (2048, 2048))
+                            image.load()
+                            images.append(image)
                         # Configure genai again in case the app was re-run
                         genai.configure(api_key=api_key)
-                        extracted_data = enhanced_gemini_extraction(image)
+                        if len(images) == 1:
+                            extracted_data = extract_with_cache(images[0])
+                            st.session_state.batch_results = None
+                        else:
+                            # One Gemini call for the whole batch; the prompt
+                            # tokens are shared across all documents
+                            batch_results = batched_gemini_extraction(images)
+                            st.session_state.batch_results = batch_results
+                            st.session_state.batch_selected = 0
+                            extracted_data = batch_results[0] if batch_results else None
                         st.session_state.extracted_data = extracted_data
                         st.session_state.edited_data = extracted_data.copy() if extracted_data else None
-                        
+
                         if extracted_data:
                             st.success("✅ Data extraction complete!")
                         else:
@@ -279,124 +490,148 @@ if st.session_state.api_key_valid:
 
     # --- Display, Edit, and Save Results ---
     if st.session_state.extracted_data:
-        st.header("2. Review and Edit Extracted Data")
-        st.info("The extracted data is shown below. You can edit any field before saving.")
+        @st.fragment
+        def review_and_save():
+            """Renders the review, edit and save/download sections. One
+            fragment covers every consumer of edited_data - metrics, table
+            view and download payloads - so an edit reruns all of them
+            together without replaying the rest of the script."""
+            st.header("2. Review and Edit Extracted Data")
+            st.info("The extracted data is shown below. You can edit any field before saving.")
+
+            batch_results = st.session_state.batch_results
+            if batch_results and len(batch_results) > 1:
+                selected = st.selectbox(
+                    "Select document to review",
+                    range(len(batch_results)),
+                    index=st.session_state.batch_selected,
+                    format_func=lambda i: f"Document {i + 1}: {batch_results[i].get('name') or 'Unknown'}"
+                )
+                if selected != st.session_state.batch_selected:
+                    st.session_state.batch_selected = selected
+                    st.session_state.extracted_data = batch_results[selected]
+                    st.session_state.edited_data = batch_results[selected].copy()
+                    # Drop stale widget state so the form shows the new document
+                    st.session_state.pop("kyc_edit", None)
+
+            data_to_edit = st.session_state.edited_data
+
+            # Display summary metrics
+            col1, col2 = st.columns(2)
+            with col1:
+                confidence_score = data_to_edit.get('confidence_score', 0)
+                if confidence_score:
+                    st.metric("Confidence Score", f"{confidence_score:.2f}")
+                else:
+                    st.metric("Confidence Score", "N/A")
+            with col2:
+                st.metric("Best Model Used", data_to_edit.get('model_used', 'Unknown'))
+
+            # Create tabs for different views
+            tab1, tab2 = st.tabs(["📝 Edit Form", "📊 Table View"])
+
+            with tab1:
+                # All editable fields in one st.data_editor; a single table
+                # component replaces ~25 text inputs per rerun.
+                # Field order for the editor (personal, employment, address,
+                # banking, nominee)
+                editable_fields = [
+                    'name', 'father_husband_name', 'date_of_birth', 'mobile_number', 'pan_number', 'aadhar_number',
+                    'control_number', 'designation', 'bill_unit_number', 'department', 'sr_number', 'date_of_appointment',
+                    'office_address', 'residential_address',
+                    'bank_name', 'branch_name', 'branch_code', 'account_number', 'ifsc_code',
+                    'nominee_name', 'nominee_relation', 'nominee_dob', 'nominee_aadhar', 'nominee_pan',
+                ]
+                editable_fields = [f for f in editable_fields if f in data_to_edit]
+
+                form_df = pd.DataFrame({
+                    "Field": [DISPLAY_LABELS[field] for field in editable_fields],
+                    "Value": [str(data_to_edit.get(field, "") or "") for field in editable_fields],
+                })
+                edited_df = st.data_editor(
+                    form_df,
+                    disabled=["Field"],
+                    num_rows="fixed",
+                    hide_index=True,
+                    use_container_width=True,
+                    key="kyc_edit"
+                )
 
-        data_to_edit = st.session_state.edited_data
-        
-        # Display summary metrics
-        col1, col2 = st.columns(2)
-        with col1:
-            confidence_score = data_to_edit.get('confidence_score', 0)
-            if confidence_score:
-                st.metric("Confidence Score", f"{confidence_score:.2f}")
-            else:
-                st.metric("Confidence Score", "N/A")
-        with col2:
-            st.metric("Best Model Used", data_to_edit.get('model_used', 'Unknown'))
-        
-        # Create tabs for different views
-        tab1, tab2 = st.tabs(["📝 Edit Form", "📊 Table View"])
-        
-        with tab1:
-            # Create editable fields for each piece of data
-            edited_data_temp = {}
-            form_fields = KYCFormData.model_fields.keys()
-            
-            # Group fields for better layout
-            personal_info = ['name', 'father_husband_name', 'date_of_birth', 'mobile_number', 'pan_number', 'aadhar_number']
-            employment_info = ['control_number', 'designation', 'bill_unit_number', 'department', 'sr_number', 'date_of_appointment']
-            address_info = ['office_address', 'residential_address']
-            bank_info = ['bank_name', 'branch_name', 'branch_code', 'account_number', 'ifsc_code']
-            nominee_info = ['nominee_name', 'nominee_relation', 'nominee_dob', 'nominee_aadhar', 'nominee_pan']
-            
-            def create_form_section(title: str, fields: List[str]):
-                with st.expander(title, expanded=True):
-                    for field in fields:
-                        if field in data_to_edit:
-                            edited_data_temp[field] = st.text_input(
-                                label=field.replace('_', ' ').title(),
-                                value=data_to_edit.get(field, "") or "",
-                                key=f"edit_{field}"
-                            )
-
-            create_form_section("👤 Personal & Identity", personal_info)
-            create_form_section("🏢 Employment Details", employment_info)
-            create_form_section("🏠 Address Information", address_info)
-            create_form_section("🏦 Banking Details", bank_info)
-            create_form_section("👨‍👩‍👧 Nominee Details", nominee_info)
-
-            # Keep non-editable metadata
-            edited_data_temp['document_title'] = data_to_edit.get('document_title')
-            edited_data_temp['society_name'] = data_to_edit.get('society_name')
-            # edited_data_temp['confidence_score'] = data_to_edit.get('confidence_score')
-            # edited_data_temp['model_used'] = data_to_edit.get('model_used')
-
-            # Update session state with edits
-            st.session_state.edited_data = edited_data_temp
-
-        with tab2:
-            # Display data in tabular format
-            st.subheader(" Extracted Data in Table Format")
-            
-            # Convert data to DataFrame for table display
-            table_data = []
-            for field, value in st.session_state.edited_data.items():
-                table_data.append({
-                    "Field": field.replace('_', ' ').title(),
-                    "Value": value if value is not None else ""
+                edited_data_temp = dict(zip(editable_fields, edited_df["Value"].tolist()))
+
+                # Keep non-editable metadata
+                edited_data_temp['document_title'] = data_to_edit.get('document_title')
+                edited_data_temp['society_name'] = data_to_edit.get('society_name')
+                # edited_data_temp['confidence_score'] = data_to_edit.get('confidence_score')
+                # edited_data_temp['model_used'] = data_to_edit.get('model_used')
+
+                # Update session state with edits
+                st.session_state.edited_data = edited_data_temp
+
+            with tab2:
+                # Display data in tabular format
+                st.subheader(" Extracted Data in Table Format")
+
+                # Convert data to DataFrame for table display, building the two
+                # columns directly instead of a dict per row
+                items = list(st.session_state.edited_data.items())
+                df_display = pd.DataFrame({
+                    "Field": [DISPLAY_LABELS.get(field, field.replace('_', ' ').title()) for field, _ in items],
+                    "Value": [value if value is not None else "" for _, value in items],
                 })
-            
-            df_display = pd.DataFrame(table_data)
-            st.dataframe(df_display, use_container_width=True, height=600)
-
-        st.header("3. Save or Download Data")
-        
-        #  action buttons
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            if st.button("Save to Excel Database", use_container_width=True):
-                if save_to_excel(st.session_state.edited_data):
-                    st.balloons()
-        
-        with col2:
-            # Download as JSON
-            json_string = json.dumps(st.session_state.edited_data, indent=2)
-            file_name = "extracted_kyc_data.json"
-            if uploaded_file:
-                file_name = f"{uploaded_file.name.split('.')[0]}_extracted.json"
-
-            st.download_button(
-                label="Download as JSON",
-                data=json_string,
-                file_name=file_name,
-                mime="application/json",
-                use_container_width=True
-            )
-        
-        with col3:
-            # Download current record as Excel
-            buffer = io.BytesIO()
-            df_single = pd.DataFrame([st.session_state.edited_data])
-            with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                df_single.to_excel(writer, sheet_name='KYC_Record', index=False)
-            
-            st.download_button(
-                label="Download as Excel",
-                data=buffer.getvalue(),
-                file_name=f"{uploaded_file.name.split('.')[0]}_kyc.xlsx" if uploaded_file else "kyc_record.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                use_container_width=True
-            )
-        
+                st.dataframe(df_display, use_container_width=True, height=600)
+
+            st.header("3. Save or Download Data")
+
+            # Stem of the uploaded filename for download names; splitext keeps
+            # dotted names like scan.v2.jpg intact
+            stem = os.path.splitext(uploaded_file.name)[0] if uploaded_file else "kyc_record"
+
+            #  action buttons
+            col1, col2, col3 = st.columns(3)
+
+            with col1:
+                if st.button("Save to Database", use_container_width=True):
+                    if save_record(st.session_state.edited_data):
+                        st.balloons()
+
+            with col2:
+                # Download as JSON
+                json_string = json.dumps(st.session_state.edited_data, indent=2)
+
+                st.download_button(
+                    label="Download as JSON",
+                    data=json_string,
+                    file_name=f"{stem}_extracted.json",
+                    mime="application/json",
+                    use_container_width=True
+                )
+
+            with col3:
+                # Download current record as Excel
+                buffer = io.BytesIO()
+                # Single hashed reindex keeps the export's column order in sync
+                # with the schema regardless of which fields were edited
+                df_single = pd.DataFrame([st.session_state.edited_data]).reindex(columns=EXCEL_COLUMNS)
+                with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
+                    df_single.to_excel(writer, sheet_name='KYC_Record', index=False)
+
+                st.download_button(
+                    label="Download as Excel",
+                    data=buffer.getvalue(),
+                    file_name=f"{stem}_kyc.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    use_container_width=True
+                )
+
+            with st.expander("🔍 Show Raw JSON Data"):
+                st.json(st.session_state.edited_data)
 
-        with st.expander("🔍 Show Raw JSON Data"):
-            st.json(st.session_state.edited_data)
+        review_and_save()
 
 else:
     st.info("Please validate your API key in the sidebar and upload an image to begin.")
 
 # --- Footer ---
 st.markdown("---")
-st.markdown("**Note:** The Excel database file will be created automatically in the same directory as this application.")
+st.markdown("**Note:** The database file will be created automatically in the same directory as this application.")